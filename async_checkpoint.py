@@ -0,0 +1,271 @@
+import atexit
+import glob
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+import torch
+from trainer.io import save_model
+
+#логгер trainer пишет и в консоль, и в trainer_0_log.txt
+logger = logging.getLogger("trainer")
+
+
+def _to_cpu(obj):
+    """Рекурсивно копирует все тензоры состояния в память CPU."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: _to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(v) for v in obj)
+    return obj
+
+
+def _loss_value(loss):
+    """Число для сравнения лоссов: trainer передает либо float, либо dict train/eval."""
+    if isinstance(loss, dict):
+        if loss.get("eval_loss") is not None:
+            return float(loss["eval_loss"])
+        return float(loss["train_loss"])
+    return float(loss)
+
+
+def _is_better(current_loss, best_loss):
+    """Та же логика сравнения, что и в trainer.io.save_best_model."""
+    if isinstance(current_loss, dict) and isinstance(best_loss, dict):
+        use_eval = current_loss.get("eval_loss") is not None and best_loss.get("eval_loss") is not None
+        key = "eval_loss" if use_eval else "train_loss"
+        return current_loss[key] < best_loss[key]
+    return _loss_value(current_loss) < _loss_value(best_loss)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _atomic_save(state, path):
+    tmp_path = path + ".tmp"
+    try:
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_quietly(tmp_path)  # не оставляем недописанный .tmp (например, при нехватке места)
+        raise
+
+
+def _atomic_copy(src, dst):
+    tmp_path = dst + ".tmp"
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+
+def _checkpoint_step(path):
+    m = re.search(r"checkpoint_(\d+)\.pth$", path)
+    return int(m.group(1)) if m else -1
+
+
+class AsyncCheckpointSaver:
+    """
+    Фоновое сохранение чекпоинтов.
+    Цикл обучения блокируется только на копирование состояния в CPU,
+    запись на диск (через .tmp и атомарный rename) идет в отдельном потоке.
+    После каждой записи применяется политика хранения:
+    keep_best_n лучших best_model_*.pth и keep_last_m последних checkpoint_*.pth.
+    track_steps() замеряет реальное время шагов: шаг с сохранением,
+    step_window шагов после него (пока пишет фоновый поток) и остальные шаги.
+    """
+
+    def __init__(self, keep_best_n=3, keep_last_m=2, max_pending=2, step_window=20):
+        self.keep_best_n = keep_best_n
+        self.keep_last_m = keep_last_m
+        self._queue = queue.Queue(maxsize=max_pending)  # ограничивает число снапшотов в памяти
+        self._lock = threading.Lock()
+        self._best = {}  # путь best_model_*.pth -> loss (только модели этого запуска)
+        self.saves = 0
+        self.blocking_time = 0.0
+        self.write_time = 0.0
+        self.failures = 0
+        self.step_window = step_window
+        self._steps_since_save = None  # None - сохранений еще не было
+        self._seen_saves = 0
+        self._step_times = {"baseline": [], "save": [], "after_save": []}
+        self._thread = threading.Thread(target=self._worker, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, state, path, copies=()):
+        """save_func для trainer.io.save_model: снапшот в CPU и постановка в очередь."""
+        start = time.perf_counter()
+        snapshot = _to_cpu(state)
+        self._queue.put((snapshot, path, tuple(copies)))
+        self.blocking_time += time.perf_counter() - start
+        self.saves += 1
+
+    def track_steps(self, trainer):
+        """Оборачивает train_step экземпляра Trainer для замера времени шагов."""
+        orig_train_step = trainer.train_step
+
+        def train_step(*args, **kwargs):
+            if self.saves != self._seen_saves:  # best_model сохраняется между эпохами, вне шага
+                self._seen_saves = self.saves
+                self._steps_since_save = 0
+            start = time.perf_counter()
+            result = orig_train_step(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            if self.saves != self._seen_saves:  # checkpoint_*.pth сохраняется внутри шага
+                self._seen_saves = self.saves
+                self._step_times["save"].append(elapsed)
+                self._steps_since_save = 0
+                return result
+            since = self._steps_since_save
+            if since is not None and since < self.step_window:
+                self._step_times["after_save"].append(elapsed)
+                self._steps_since_save = since + 1
+            else:
+                self._step_times["baseline"].append(elapsed)
+            return result
+
+        trainer.train_step = train_step
+
+    def save_checkpoint(
+        self,
+        config,
+        model,
+        optimizer,
+        scaler,
+        current_step,
+        epoch,
+        output_folder,
+        save_n_checkpoints=None,
+        save_func=None,
+        **kwargs,
+    ):
+        """Замена trainer.io.save_checkpoint; save_n_checkpoints заменяется keep_last_m."""
+        checkpoint_path = os.path.join(output_folder, f"checkpoint_{current_step}.pth")
+        logger.info("\n > CHECKPOINT (async): %s", checkpoint_path)
+        save_model(
+            config, model, optimizer, scaler, current_step, epoch, checkpoint_path,
+            save_func=self.submit, **kwargs,
+        )
+
+    def save_best_model(
+        self,
+        current_loss,
+        best_loss,
+        config,
+        model,
+        optimizer,
+        scaler,
+        current_step,
+        epoch,
+        out_path,
+        keep_all_best=False,
+        keep_after=0,
+        save_func=None,
+        **kwargs,
+    ):
+        """Замена trainer.io.save_best_model; вместо keep_all_best действует keep_best_n."""
+        if not _is_better(current_loss, best_loss) or current_step <= int(keep_after):
+            return best_loss
+
+        checkpoint_path = os.path.join(out_path, f"best_model_{current_step}.pth")
+        shortcut_path = os.path.join(out_path, "best_model.pth")
+        logger.info(" > BEST MODEL (async): %s", checkpoint_path)
+        with self._lock:
+            self._best[checkpoint_path] = _loss_value(current_loss)
+
+        def _submit_best(state, path):
+            self.submit(state, path, copies=[shortcut_path])
+
+        save_model(
+            config, model, optimizer, scaler, current_step, epoch, checkpoint_path,
+            model_loss=current_loss, save_func=_submit_best, **kwargs,
+        )
+        return current_loss
+
+    def install(self, trainer_module):
+        """Подменяет функции сохранения, которые использует trainer.trainer."""
+        trainer_module.save_checkpoint = self.save_checkpoint
+        trainer_module.save_best_model = self.save_best_model
+
+    def wait(self):
+        """Блокирует до завершения всех поставленных в очередь записей."""
+        self._queue.join()
+
+    def close(self):
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        if not self.saves:
+            return
+        logger.info(
+            "[checkpoint] сохранений: %d (ошибок: %d), копирование в CPU: %.3f с/сохр., "
+            "фоновая запись: %.3f с/сохр. (столько блокировало бы синхронное сохранение)",
+            self.saves,
+            self.failures,
+            self.blocking_time / self.saves,
+            self.write_time / self.saves,
+        )
+        for kind, label in (
+            ("baseline", "шаги без сохранения"),
+            ("save", "шаги с сохранением"),
+            ("after_save", f"{self.step_window} шагов после сохранения"),
+        ):
+            times = self._step_times[kind]
+            if times:
+                logger.info(
+                    "[checkpoint] %s: %.1f мс/шаг (шагов: %d)", label, 1000 * sum(times) / len(times), len(times)
+                )
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                snapshot, path, copies = item
+                start = time.perf_counter()
+                _atomic_save(snapshot, path)
+                for copy_path in copies:
+                    _atomic_copy(path, copy_path)
+                self._prune(os.path.dirname(path))
+                self.write_time += time.perf_counter() - start
+            except Exception:
+                self.failures += 1
+                logger.exception(" [!] Не удалось сохранить чекпоинт %s", item[1])
+            finally:
+                self._queue.task_done()
+
+    def _prune(self, folder):
+        checkpoints = sorted(glob.glob(os.path.join(folder, "checkpoint_*.pth")), key=_checkpoint_step)
+        stale = checkpoints[:-self.keep_last_m] if self.keep_last_m > 0 else checkpoints
+
+        with self._lock:
+            ranked = sorted(self._best, key=self._best.get)
+            for path in ranked[self.keep_best_n:]:
+                #ещё не записанный файл удаляем после его записи, на следующем проходе
+                if os.path.dirname(path) == folder and os.path.exists(path):
+                    del self._best[path]
+                    stale.append(path)
+
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except PermissionError as exc:
+                logger.warning(" [!] Не удалось удалить %s из-за блокировки: %s. Пропускаю.", path, exc)
@@ -0,0 +1,201 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import torch
+import torch.distributed as dist
+from torch import nn
+from torch.nn.parallel import DistributedDataParallel
+
+
+def get_world():
+    """Ранг и число процессов из окружения (его задает launch() или torchrun)."""
+    return int(os.environ.get("RANK", 0)), int(os.environ.get("WORLD_SIZE", 1))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch(script, nproc, argv, log_dir):
+    """
+    Запускает nproc копий script как ранги DDP (gloo, CPU) и ждет их завершения.
+    Вывод ранга 0 идет в консоль, остальных - в log_dir/rank_<N>.log.
+    Если один из рангов падает, остальные останавливаются (иначе они зависнут в all_reduce).
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    port = _free_port()
+    procs = []
+    logs = []
+    for rank in range(nproc):
+        env = dict(
+            os.environ,
+            RANK=str(rank),
+            LOCAL_RANK=str(rank),
+            WORLD_SIZE=str(nproc),
+            MASTER_ADDR="127.0.0.1",
+            MASTER_PORT=str(port),
+            CUDA_VISIBLE_DEVICES="",  # gloo на CPU, GPU не нужны
+            USE_LIBUV="0",  # сборки PyTorch под Windows идут без libuv
+        )
+        stdout = None
+        if rank > 0:
+            stdout = open(os.path.join(log_dir, f"rank_{rank}.log"), "w", encoding="utf-8")
+            logs.append(stdout)
+        procs.append(
+            subprocess.Popen(
+                [sys.executable, script, *argv],
+                env=env,
+                stdout=stdout,
+                stderr=subprocess.STDOUT if stdout else None,
+            )
+        )
+    print(f"[ddp] запущено рангов: {nproc} (gloo, CPU), логи рангов > 0: {log_dir}")
+
+    exit_code = 0
+    try:
+        while any(p.poll() is None for p in procs):
+            failed = [p for p in procs if p.poll() not in (None, 0)]
+            if failed:
+                exit_code = failed[0].returncode
+                print(f"[ddp] ранг {procs.index(failed[0])} завершился с кодом {exit_code}, останавливаю остальные.")
+                break
+            time.sleep(1)
+    except KeyboardInterrupt:
+        exit_code = 1
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in procs:
+            p.wait()
+        for f in logs:
+            f.close()
+    # ранг, убитый сигналом (например OOM killer), дает отрицательный код
+    return exit_code or next((p.returncode for p in procs if p.returncode), 0)
+
+
+def init_process_group(rank, world_size):
+    """Инициализация gloo по MASTER_ADDR/MASTER_PORT и деление потоков CPU между рангами."""
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+
+
+def shard_samples(samples, rank, world_size):
+    """
+    Доля сэмплов для ранга: каждый world_size-й, начиная с rank.
+    Шарды обрезаются до одинаковой длины, чтобы у рангов было одинаковое число шагов.
+    """
+    per_rank = len(samples) // world_size
+    return samples[rank::world_size][:per_rank]
+
+
+class _ForwardModule(nn.Module):
+    """Обертка для DDP: вызывает исходный forward модели в обход подмененного model.forward."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self._forward = type(model).forward
+
+    def forward(self, *args, **kwargs):
+        return self._forward(self.model, *args, **kwargs)
+
+
+class DDPTraining:
+    """
+    DDP поверх coqui Trainer без GPU.
+    Trainer вызывает model.train_step, а тот - self.forward, поэтому
+    model.forward перенаправляется в DistributedDataParallel: градиенты
+    усредняются между рангами во время backward. Forward без градиентов
+    (валидация только на ранге 0, data-dependent init) идет мимо DDP: после join()
+    каждый forward DDP делает all_reduce, которому на других рангах нет пары.
+    Логирование и чекпоинты trainer сам делает только на ранге 0 (по args.rank и RANK).
+    После каждой эпохи ранг 0 дописывает пропускную способность в scaling_path.
+    """
+
+    def __init__(self, rank, world_size, scaling_path):
+        self.rank = rank
+        self.world_size = world_size
+        self.scaling_path = scaling_path
+        self._params_synced = False
+
+    def install(self, trainer):
+        self.trainer = trainer
+        model = trainer.model
+        self.ddp = DistributedDataParallel(_ForwardModule(model), find_unused_parameters=True)
+        model_forward = type(model).forward
+
+        def _ddp_forward(*args, **kwargs):
+            if not torch.is_grad_enabled() or not model.training:
+                return model_forward(model, *args, **kwargs)
+            return self.ddp(*args, **kwargs)
+
+        model.forward = _ddp_forward
+        self._orig_train_step = trainer.train_step
+        self._orig_train_epoch = trainer.train_epoch
+        trainer.train_step = self.train_step
+        trainer.train_epoch = self.train_epoch
+
+    def train_step(self, batch, batch_n_steps, step, loader_start_time):
+        # GlowTTS первые data_dep_init_steps шагов инициализирует ActNorm по данным
+        # своего ранга - после этого веса снова выравниваются по рангу 0
+        model = self.trainer.model
+        if not self._params_synced and self.trainer.total_steps_done >= getattr(model, "data_dep_init_steps", 0):
+            with torch.no_grad():
+                for p in model.parameters():
+                    dist.broadcast(p.data, src=0)
+            self._params_synced = True
+        return self._orig_train_step(batch, batch_n_steps, step, loader_start_time)
+
+    def train_epoch(self):
+        start = time.perf_counter()
+        # join() допускает разное число батчей у рангов (после фильтрации по длине)
+        with self.ddp.join():
+            self._orig_train_epoch()
+        elapsed = time.perf_counter() - start
+
+        loader = self.trainer.train_loader
+        n_samples = len(loader.dataset) if loader is not None else len(self.trainer.train_samples)
+        elapsed_t = torch.tensor([elapsed], dtype=torch.float64)
+        samples_t = torch.tensor([float(n_samples)], dtype=torch.float64)
+        dist.all_reduce(elapsed_t, op=dist.ReduceOp.MAX)
+        dist.all_reduce(samples_t, op=dist.ReduceOp.SUM)
+
+        if self.rank == 0:
+            throughput = samples_t.item() / elapsed_t.item()
+            print(f"[ddp] эпоха {self.trainer.epochs_done}: {throughput:.2f} сэмплов/с на {self.world_size} рангах")
+            record_scaling(self.scaling_path, self.world_size, throughput)
+            report_scaling(self.scaling_path)
+
+
+def record_scaling(path, world_size, throughput):
+    """Сохраняет пропускную способность (сэмплов/с) последней эпохи для данного числа рангов."""
+    results = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            results = json.load(f)
+    results[str(world_size)] = throughput
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def report_scaling(path):
+    """Таблица масштабирования: ускорение и эффективность относительно 1 ранга."""
+    with open(path, "r", encoding="utf-8") as f:
+        results = {int(k): v for k, v in json.load(f).items()}
+    base = results.get(1)
+    print(f"{'ranks':>6}{'samples/s':>12}{'speedup':>10}{'efficiency':>12}")
+    for n in sorted(results):
+        if base:
+            speedup = results[n] / base
+            print(f"{n:>6}{results[n]:>12.2f}{speedup:>10.2f}{100 * speedup / n:>11.1f}%")
+        else:
+            print(f"{n:>6}{results[n]:>12.2f}{'-':>10}{'-':>12}")
+    if not base:
+        print("Для расчета эффективности запустите также --nproc 1.")
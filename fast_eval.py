@@ -0,0 +1,112 @@
+import logging
+import os
+import time
+
+#логгер trainer пишет и в консоль, и в trainer_0_log.txt (его читает view_tensorboard.py)
+logger = logging.getLogger("trainer")
+
+
+def _sample_length(sample):
+    """Длина сэмпла: размер WAV пропорционален длительности, иначе длина текста."""
+    audio_file = sample.get("audio_file") if isinstance(sample, dict) else sample[1]
+    try:
+        return os.path.getsize(audio_file)
+    except (OSError, TypeError):
+        text = sample.get("text", "") if isinstance(sample, dict) else sample[0]
+        return len(text)
+
+
+def stratified_subset(samples, subset_size, strata=4):
+    """
+    Фиксированное подмножество, стратифицированное по длине:
+    сэмплы сортируются по длине, делятся на strata равных групп,
+    из каждой группы берутся равномерно расположенные сэмплы.
+    Если группа меньше своей доли, недостача переходит к остальным группам.
+    """
+    if len(samples) <= subset_size:
+        return list(samples)
+
+    ordered = sorted(samples, key=_sample_length)
+    strata = max(1, min(strata, subset_size))
+    groups = [ordered[s * len(ordered) // strata:(s + 1) * len(ordered) // strata] for s in range(strata)]
+
+    #доли раздаются по одной по кругу, не больше размера группы
+    takes = [0] * strata
+    remaining = subset_size
+    while remaining:
+        for s, group in enumerate(groups):
+            if remaining and takes[s] < len(group):
+                takes[s] += 1
+                remaining -= 1
+
+    subset = []
+    for group, take in zip(groups, takes):
+        if take:
+            step = len(group) / take  # >= 1, поэтому индексы не повторяются
+            subset.extend(group[int(i * step)] for i in range(take))
+    return subset
+
+
+class FastEval:
+    """
+    Быстрая валидация: в большинстве эпох оценивается фиксированное подмножество,
+    полный metadata_val - раз в full_every эпох и в последней эпохе.
+    Батчи (референсные мел-спектрограммы и последовательности токенов) собираются
+    один раз и хранятся в памяти между эпохами, поэтому загрузка аудио и
+    извлечение признаков не повторяются.
+    Лосс подмножества и полного набора несравнимы, поэтому best_model
+    обновляется только по эпохам с полной валидацией.
+    """
+
+    def __init__(self, subset_size=64, full_every=5, strata=4):
+        self.subset_size = subset_size
+        self.full_every = full_every
+        self.strata = strata
+        self._batches = {}
+        self._last_eval_full = False
+
+    def install(self, trainer):
+        """Подменяет eval_epoch у экземпляра Trainer."""
+        self.trainer = trainer
+        self.full_samples = list(trainer.eval_samples)
+        self.subset_samples = stratified_subset(self.full_samples, self.subset_size, self.strata)
+        self._orig_eval_epoch = trainer.eval_epoch
+        self._orig_save_best_model = trainer.save_best_model
+        trainer.eval_epoch = self.eval_epoch
+        trainer.save_best_model = self.save_best_model
+        print(
+            f"[fast-eval] подмножество {len(self.subset_samples)} из {len(self.full_samples)}, "
+            f"полная валидация каждые {self.full_every} эпох"
+        )
+
+    def _is_full_epoch(self):
+        epoch = self.trainer.epochs_done + 1
+        return epoch % self.full_every == 0 or epoch == self.trainer.config.epochs
+
+    def eval_epoch(self):
+        trainer = self.trainer
+        key = "full" if self._is_full_epoch() else "subset"
+        samples = self.full_samples if key == "full" else self.subset_samples
+
+        start = time.perf_counter()
+        if key not in self._batches:
+            loader = trainer.get_eval_dataloader(trainer.training_assets, samples, verbose=True)
+            self._batches[key] = list(loader)
+        trainer.eval_loader = self._batches[key]
+        self._last_eval_full = key == "full"
+        self._orig_eval_epoch()
+        eval_time = time.perf_counter() - start
+
+        logger.info(
+            " > EVAL WALL TIME: %.2f s (epoch %d, %s, %d utt)",
+            eval_time,
+            trainer.epochs_done,
+            key,
+            len(samples),
+        )
+
+    def save_best_model(self):
+        if not self._last_eval_full:
+            logger.info(" > BEST MODEL: пропуск, валидация эпохи была на подмножестве")
+            return
+        self._orig_save_best_model()
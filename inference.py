@@ -1,9 +1,21 @@
+import argparse
+import os
+
 import torch
 from TTS.utils.synthesizer import Synthesizer
 
+from profiling import InferenceProfiler
+
 cfg_path = r"ruslan_glowtts_exp\run-December-11-2025_12+54PM-0000000\config.json"
 model_path = r"ruslan_glowtts_exp\run-December-11-2025_09+56AM-0000000\best_model_131850.pth"
 
+parser = argparse.ArgumentParser(description="Синтез тестовой фразы.")
+parser.add_argument("--profile", action="store_true", help="Профилировать вызовы synth.tts (torch profiler)")
+parser.add_argument("--profile-calls", type=int, default=3, help="Сколько вызовов профилировать")
+args = parser.parse_args()
+if args.profile_calls < 1:
+    parser.error("--profile-calls должно быть не меньше 1")
+
 #cоздаем синтезатор, будем использовать Griffin-Lim
 synth = Synthesizer(
     tts_checkpoint=model_path,
@@ -11,5 +23,14 @@ synth = Synthesizer(
     use_cuda=torch.cuda.is_available(),
 )
 
-wav = synth.tts("привет! это тест модели")
+tts = synth.tts
+n_calls = 1
+if args.profile:
+    #результаты пишутся в <run>/profile рядом с чекпоинтом
+    profiler = InferenceProfiler(os.path.join(os.path.dirname(model_path), "profile"), num_calls=args.profile_calls)
+    tts = profiler.wrap(synth.tts)
+    n_calls = args.profile_calls
+
+for _ in range(n_calls):
+    wav = tts("привет! это тест модели")
 synth.save_wav(wav, "output.wav")
\ No newline at end of file
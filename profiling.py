@@ -0,0 +1,270 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import torch
+from torch.optim.optimizer import register_optimizer_step_post_hook, register_optimizer_step_pre_hook
+from torch.profiler import ProfilerActivity, profile, record_function
+
+PHASES = ["data_wait", "forward", "backward", "optimizer", "other"]
+
+logger = logging.getLogger("trainer")
+
+
+def _sync():
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+
+def _reset_peak_memory():
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+
+def _peak_memory_mb(prof):
+    """
+    Пик памяти за окно профилирования.
+    CUDA: max_memory_allocated (счетчик сбрасывается в начале окна).
+    CPU: максимум накопленной суммы выделений/освобождений по событиям профайлера,
+    то есть прирост относительно памяти на начало окна.
+    """
+    if torch.cuda.is_available():
+        return {"device": "cuda", "peak_mb": torch.cuda.max_memory_allocated() / 2**20}
+    deltas = []
+    for e in prof.events():
+        # освобождения памяти, выделенной до окна, приходят отдельными событиями [memory]
+        delta = e.cpu_memory_usage if e.name == "[memory]" else e.self_cpu_memory_usage
+        if delta:
+            deltas.append((e.time_range.start, delta))
+    current = peak = 0
+    for _, delta in sorted(deltas):
+        current += delta
+        peak = max(peak, current)
+    return {"device": "cpu", "peak_mb": peak / 2**20}
+
+
+class _ProfilerWindow:
+    """Общая часть: torch profiler на ограниченном окне и запись результатов в out_dir."""
+
+    def __init__(self, out_dir, name):
+        self.out_dir = out_dir
+        self.name = name
+        self.prof = None
+
+    def start(self):
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        _reset_peak_memory()
+        self.prof = profile(activities=activities, profile_memory=True, record_shapes=True)
+        self.prof.__enter__()
+
+    def stop(self, summary, phase_table=""):
+        _sync()
+        self.prof.__exit__(None, None, None)
+        summary.update(_peak_memory_mb(self.prof))
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        trace_path = os.path.join(self.out_dir, f"trace_{self.name}.json")
+        self.prof.export_chrome_trace(trace_path)
+
+        sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+        ops_table = self.prof.key_averages().table(sort_by=sort_by, row_limit=30)
+        peak = summary["peak_mb"]
+        peak_line = f"window peak memory ({summary['device']}): {peak:.1f} MB"
+        with open(os.path.join(self.out_dir, f"summary_{self.name}.txt"), "w", encoding="utf-8") as f:
+            f.write(phase_table + peak_line + "\n\n" + ops_table + "\n")
+        with open(os.path.join(self.out_dir, f"profile_{self.name}.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        print(phase_table + peak_line)
+        print(f"[profile] трасса и сводка: {self.out_dir}")
+        self.prof = None
+
+
+class TrainingProfiler:
+    """
+    Профилирование окна шагов обучения: пропускаются start_step шагов (прогрев),
+    затем num_steps шагов снимаются torch profiler'ом. Для каждого шага
+    время делится на ожидание DataLoader и вычисления (forward / backward /
+    optimizer / прочее). Результаты пишутся в <run>/profile.
+    Если обучение закончилось раньше конца окна, close() пишет частичную сводку.
+    """
+
+    def __init__(self, start_step=10, num_steps=20):
+        self.start_step = start_step
+        self.num_steps = num_steps
+        self.step = 0
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._marks = {}
+        self._hooks = []
+        self.window = None
+        self._running = False
+
+    def install(self, trainer):
+        """Оборачивает train_step и _compute_loss экземпляра Trainer."""
+        self.trainer = trainer
+        self.window = _ProfilerWindow(os.path.join(trainer.output_path, "profile"), "train")
+        self._orig_train_step = trainer.train_step
+        self._orig_compute_loss = trainer._compute_loss
+        trainer.train_step = self.train_step
+        trainer._compute_loss = self._compute_loss
+
+    @property
+    def active(self):
+        return self.start_step <= self.step < self.start_step + self.num_steps
+
+    def _mark(self, name):
+        _sync()
+        self._marks[name] = time.perf_counter()
+
+    def _compute_loss(self, *args, **kwargs):
+        if not self.active:
+            return self._orig_compute_loss(*args, **kwargs)
+        self._mark("forward_start")
+        with record_function("forward"):
+            result = self._orig_compute_loss(*args, **kwargs)
+        self._mark("forward_end")
+        return result
+
+    def _optimizer_pre_hook(self, optimizer, args, kwargs):
+        self._mark("optimizer_start")
+
+    def _optimizer_post_hook(self, optimizer, args, kwargs):
+        self._mark("optimizer_end")
+
+    def train_step(self, batch, batch_n_steps, step, loader_start_time):
+        if not self.active:
+            self.step += 1
+            return self._orig_train_step(batch, batch_n_steps, step, loader_start_time)
+
+        # loader_start_time trainer берет из time.time(); ожидание считаем до старта
+        # профайлера, иначе его запуск (секунды при первом старте) попадет в data_wait
+        data_wait = time.time() - loader_start_time
+        if self.step == self.start_step:
+            self._start()
+        self._marks = {}
+        self._mark("step_start")
+        with record_function("train_step"):
+            result = self._orig_train_step(batch, batch_n_steps, step, loader_start_time)
+        self._mark("step_end")
+        self._accumulate(data_wait)
+
+        self.step += 1
+        if self.step == self.start_step + self.num_steps:
+            self._stop()
+        return result
+
+    def _accumulate(self, data_wait):
+        m = self._marks
+        compute = m["step_end"] - m["step_start"]
+        forward = m.get("forward_end", 0.0) - m.get("forward_start", 0.0)
+        backward = optimizer = 0.0
+        if "optimizer_start" in m and "forward_end" in m:
+            backward = m["optimizer_start"] - m["forward_end"]
+            optimizer = m["optimizer_end"] - m["optimizer_start"]
+        self.totals["data_wait"] += data_wait
+        self.totals["forward"] += forward
+        self.totals["backward"] += backward
+        self.totals["optimizer"] += optimizer
+        self.totals["other"] += max(0.0, compute - forward - backward - optimizer)
+
+    def _start(self):
+        self._hooks = [
+            register_optimizer_step_pre_hook(self._optimizer_pre_hook),
+            register_optimizer_step_post_hook(self._optimizer_post_hook),
+        ]
+        print(f"[profile] старт профилирования: шаги {self.start_step}..{self.start_step + self.num_steps - 1}")
+        self.window.start()
+        self._running = True
+
+    def close(self):
+        """Закрывает незавершенное окно (короткий запуск, ошибка, Ctrl+C)."""
+        if self._running:
+            logger.warning(
+                " [!] Обучение закончилось до конца окна профилирования: записана частичная сводка (%d из %d шагов).",
+                self.step - self.start_step,
+                self.num_steps,
+            )
+            self._stop()
+        elif self.step < self.start_step:
+            logger.warning(
+                " [!] Профилирование не выполнено: сделано %d шагов, окно начинается с шага %d.",
+                self.step,
+                self.start_step,
+            )
+
+    def _stop(self):
+        self._running = False
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+
+        steps = self.step - self.start_step
+        total = sum(self.totals.values())
+        lines = [f"{'phase':<12}{'total_s':>10}{'mean_ms':>10}{'share':>8}"]
+        for phase in PHASES:
+            value = self.totals[phase]
+            share = 100.0 * value / total if total > 0 else 0.0
+            mean_ms = 1000 * value / steps if steps > 0 else 0.0
+            lines.append(f"{phase:<12}{value:>10.3f}{mean_ms:>10.1f}{share:>7.1f}%")
+        compute = total - self.totals["data_wait"]
+        lines.append(f"data_wait / compute: {self.totals['data_wait']:.3f} s / {compute:.3f} s")
+
+        summary = {
+            "kind": "train",
+            "steps": steps,
+            "planned_steps": self.num_steps,
+            "start_step": self.start_step,
+            "phases_s": self.totals,
+            "data_wait_s": self.totals["data_wait"],
+            "compute_s": compute,
+        }
+        self.window.stop(summary, "\n".join(lines) + "\n")
+
+
+class InferenceProfiler:
+    """
+    Профилирование первых num_calls вызовов функции синтеза (например Synthesizer.tts).
+    Результаты пишутся в out_dir (обычно <run>/profile рядом с чекпоинтом).
+    """
+
+    def __init__(self, out_dir, name="inference", num_calls=3):
+        self.window = _ProfilerWindow(out_dir, name)
+        self.num_calls = num_calls
+        self.calls = 0
+        self.call_times = []
+        self._lock = threading.Lock()  # в боте синтез идет в пуле потоков
+
+    def wrap(self, fn):
+        def wrapper(*args, **kwargs):
+            if self.calls >= self.num_calls:
+                return fn(*args, **kwargs)
+            with self._lock:
+                if self.calls >= self.num_calls:
+                    return fn(*args, **kwargs)
+                if self.calls == 0:
+                    self.window.start()
+                start = time.perf_counter()
+                with record_function("inference_call"):
+                    result = fn(*args, **kwargs)
+                _sync()
+                self.call_times.append(time.perf_counter() - start)
+                self.calls += 1
+                if self.calls == self.num_calls:
+                    self._stop()
+                return result
+
+        return wrapper
+
+    def _stop(self):
+        mean_ms = 1000 * sum(self.call_times) / len(self.call_times)
+        table = (
+            f"{'call':<6}{'time_ms':>10}\n"
+            + "".join(f"{i:<6}{1000 * t:>10.1f}\n" for i, t in enumerate(self.call_times))
+            + f"mean: {mean_ms:.1f} ms\n"
+        )
+        summary = {"kind": "inference", "calls": self.num_calls, "call_times_s": self.call_times}
+        self.window.stop(summary, table)
@@ -1,9 +1,17 @@
 import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import soundfile as sf
 from scipy.signal import resample_poly
 
+#параметры фреймов совпадают с AudioProcessor (fft_size/hop_length), чтобы
+#число удалённых фреймов соответствовало числу мел-фреймов в обучении
+FRAME_LENGTH = 1024
+HOP_LENGTH = 256
+
 
 def load_audio(path: Path):
     audio, sr = sf.read(path, always_2d=False)
@@ -53,6 +61,122 @@ def process_dataset(src_root: Path, dst_root: Path, target_sr: int = 22050):
     print(f"Результат: {dst_root}")
 
 
+def frame_energy_db(audio, frame_length: int = FRAME_LENGTH, hop_length: int = HOP_LENGTH):
+    """
+    Энергия каждого фрейма в дБ.
+    Считается через кумулятивную сумму квадратов, без цикла по фреймам.
+    """
+    mono = audio.mean(axis=1) if audio.ndim > 1 else audio
+    if len(mono) < frame_length:
+        mono = np.pad(mono, (0, frame_length - len(mono)))
+
+    sq = np.concatenate(([0.0], np.cumsum(np.square(mono, dtype=np.float64))))
+    starts = np.arange(0, len(mono) - frame_length + 1, hop_length)
+    power = (sq[starts + frame_length] - sq[starts]) / frame_length
+    return 10.0 * np.log10(np.maximum(power, 1e-10))
+
+
+def trim_silence(
+    audio,
+    top_db: float = 40.0,
+    frame_length: int = FRAME_LENGTH,
+    hop_length: int = HOP_LENGTH,
+    pad_frames: int = 2,
+):
+    """
+    Обрезает тишину в начале и конце записи.
+    Тишина - фреймы, энергия которых ниже максимума больше чем на top_db.
+    Возвращает обрезанное аудио и число удалённых фреймов (по hop_length).
+    """
+    db = frame_energy_db(audio, frame_length, hop_length)
+    voiced = np.flatnonzero(db > db.max() - top_db)
+    if voiced.size == 0:
+        return audio, 0
+
+    start_frame = max(0, int(voiced[0]) - pad_frames)
+    end_frame = min(len(db), int(voiced[-1]) + 1 + pad_frames)
+    start = start_frame * hop_length
+    end = min(len(audio), (end_frame - 1) * hop_length + frame_length)
+
+    trimmed = audio[start:end]
+    removed_frames = (len(audio) - len(trimmed)) // hop_length
+    return trimmed, removed_frames
+
+
+def normalize_loudness(audio, target_dbfs: float = -23.0, peak: float = 0.99):
+    """Приводит RMS-громкость к target_dbfs, не допуская клиппинга выше peak."""
+    if audio.size == 0:
+        return audio
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))
+    if not rms > 0.0:  # тишина или nan
+        return audio
+    gain = 10.0 ** ((target_dbfs - 20.0 * np.log10(rms)) / 20.0)
+    out = audio * gain
+    max_abs = float(np.max(np.abs(out)))
+    if max_abs > peak:
+        out = out * (peak / max_abs)
+    return out
+
+
+def _trim_file(task):
+    """Обработка одного файла в отдельном процессе (должна быть на уровне модуля для pickle)."""
+    src_path, dst_path, top_db, target_dbfs = task
+    audio, sr = load_audio(src_path)
+    trimmed, removed_frames = trim_silence(audio, top_db=top_db)
+    trimmed = normalize_loudness(trimmed, target_dbfs=target_dbfs)
+    save_audio(dst_path, trimmed, sr)
+    return len(audio), len(trimmed), sr, removed_frames
+
+
+def trim_dataset(
+    src_root: Path,
+    dst_root: Path,
+    top_db: float = 40.0,
+    target_dbfs: float = -23.0,
+    workers: int = None,
+    report_name: str = "trim_report.tsv",
+):
+    """
+    Обрезка тишины и нормализация громкости всех WAV параллельно по файлам.
+    src_root и dst_root могут совпадать (обработка на месте).
+    Пофайловый отчёт пишется в dst_root/report_name, сводка по корпусу - в stdout.
+    """
+    wavs = sorted(src_root.rglob("*.wav"))
+    total = len(wavs)
+    tasks = [(p, dst_root / p.relative_to(src_root), top_db, target_dbfs) for p in wavs]
+
+    seconds_before = 0.0
+    seconds_after = 0.0
+    frames_removed = 0
+    rows = []
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = pool.map(_trim_file, tasks, chunksize=32)
+        for i, (wav_path, (n_before, n_after, sr, removed)) in enumerate(zip(wavs, results), 1):
+            seconds_before += n_before / sr
+            seconds_after += n_after / sr
+            frames_removed += removed
+            rows.append((wav_path.relative_to(src_root), n_before, n_after, removed))
+
+            if i % 500 == 0 or i == total:
+                print(f"[{i}/{total}] обработано (удалено фреймов: {frames_removed})")
+
+    dst_root.mkdir(parents=True, exist_ok=True)
+    report_path = dst_root / report_name
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write("file\tsamples_before\tsamples_after\tframes_removed\n")
+        for rel, n_before, n_after, removed in rows:
+            f.write(f"{rel.as_posix()}\t{n_before}\t{n_after}\t{removed}\n")
+
+    hours_before = seconds_before / 3600
+    hours_after = seconds_after / 3600
+    saved = 100.0 * (1 - hours_after / hours_before) if hours_before > 0 else 0.0
+    print(f"\nИтог обрезки: файлов {total}, удалено фреймов {frames_removed} (hop={HOP_LENGTH}).")
+    print(f"Часов аудио: до {hours_before:.2f}, после {hours_after:.2f} (-{saved:.1f}%).")
+    print(f"Отчёт по файлам: {report_path}")
+    return hours_before, hours_after, frames_removed
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Ресемплинг всех WAV до нужной частоты."
@@ -75,12 +199,46 @@ def main():
         default=22050,
         help="Целевая частота дискретизации (по умолчанию 22050)",
     )
+    parser.add_argument(
+        "--trim",
+        action="store_true",
+        help="После ресемплинга обрезать тишину и нормализовать громкость в --dst",
+    )
+    parser.add_argument(
+        "--trim-only",
+        action="store_true",
+        help="Только обрезка тишины и нормализация уже ресемплированных WAV в --dst",
+    )
+    parser.add_argument(
+        "--top-db",
+        type=float,
+        default=40.0,
+        help="Порог тишины в дБ ниже максимума энергии (по умолчанию 40)",
+    )
+    parser.add_argument(
+        "--target-dbfs",
+        type=float,
+        default=-23.0,
+        help="Целевая RMS-громкость в dBFS (по умолчанию -23)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Число процессов для обрезки (по умолчанию число ядер)",
+    )
     args = parser.parse_args()
 
-    if not args.src.exists():
-        raise SystemExit(f"Источник не найден: {args.src}")
+    if args.trim_only:
+        if not args.dst.exists():
+            raise SystemExit(f"Каталог не найден: {args.dst}")
+    else:
+        if not args.src.exists():
+            raise SystemExit(f"Источник не найден: {args.src}")
+        process_dataset(args.src, args.dst, args.sr)
 
-    process_dataset(args.src, args.dst, args.sr)
+    if args.trim or args.trim_only:
+        trim_dataset(args.dst, args.dst, args.top_db, args.target_dbfs, args.workers)
 
 
 if __name__ == "__main__":
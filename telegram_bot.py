@@ -17,9 +17,13 @@ from telegram.ext import (
     filters,
 )
 
+from profiling import InferenceProfiler
+
 BASE_DIR = Path(__file__).parent
 CFG_PATH = BASE_DIR / "ruslan_glowtts_exp" / "run-December-15-2025_10+31AM-0000000" / "config.json"
 MODEL_PATH = BASE_DIR / "ruslan_glowtts_exp" / "run-December-15-2025_10+31AM-0000000" / "best_model_84384.pth"
+#профилирование первых N запросов синтеза (0 - выключено), результаты в <run>/profile
+PROFILE_CALLS = int(os.environ.get("TTS_PROFILE_CALLS", "0"))
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -32,10 +36,14 @@ synth = Synthesizer(
     use_cuda=torch.cuda.is_available(),
 )
 
+synth_tts = synth.tts
+if PROFILE_CALLS > 0:
+    synth_tts = InferenceProfiler(MODEL_PATH.parent / "profile", name="telegram", num_calls=PROFILE_CALLS).wrap(synth.tts)
+
 
 def text_to_wav_bytes(text: str) -> io.BytesIO:
     """Синтезирует речь и возвращает WAV в буфере памяти."""
-    wav = synth.tts(text)
+    wav = synth_tts(text)
     buf = io.BytesIO()
     sf.write(buf, wav, synth.output_sample_rate, format="WAV")
     buf.seek(0)
@@ -1,5 +1,7 @@
+import argparse
 import os
 import sys
+import torch
 from trainer import Trainer, TrainerArgs
 import trainer.trainer as trainer_module
 from TTS.tts.configs.glow_tts_config import GlowTTSConfig
@@ -9,6 +11,11 @@ from TTS.tts.models.glow_tts import GlowTTS
 from TTS.tts.utils.text.tokenizer import TTSTokenizer
 from TTS.utils.audio import AudioProcessor
 
+from async_checkpoint import AsyncCheckpointSaver
+from distributed import DDPTraining, get_world, init_process_group, launch, shard_samples
+from fast_eval import FastEval
+from profiling import TrainingProfiler
+
 _venv_sp = os.path.join(os.path.dirname(__file__), ".venv311", "Lib", "site-packages")
 if os.path.isdir(_venv_sp) and _venv_sp not in sys.path:
     sys.path.insert(0, _venv_sp)
@@ -20,6 +27,33 @@ DATASET_PATH = os.path.abspath("data_22050")
 
 os.makedirs(OUTPUT_PATH, exist_ok=True)
 
+parser = argparse.ArgumentParser(description="Обучение GlowTTS на RUSLAN.")
+parser.add_argument("--profile", action="store_true", help="Профилировать окно шагов обучения (torch profiler)")
+parser.add_argument("--profile-start", type=int, default=10, help="Сколько шагов пропустить перед окном (прогрев)")
+parser.add_argument("--profile-steps", type=int, default=20, help="Сколько шагов профилировать")
+parser.add_argument("--nproc", type=int, default=None, help="Запустить N рангов DDP (gloo, CPU)")
+args, _ = parser.parse_known_args()
+
+#режим запуска DDP: этот процесс только стартует ранги с теми же аргументами
+if args.nproc and "WORLD_SIZE" not in os.environ:
+    sys.exit(launch(os.path.abspath(__file__), args.nproc, sys.argv[1:], os.path.join(OUTPUT_PATH, "ddp_ranks")))
+
+#ранг DDP (WORLD_SIZE задают launch() или torchrun)
+DISTRIBUTED = "WORLD_SIZE" in os.environ
+RANK, WORLD_SIZE = get_world()
+if DISTRIBUTED:
+    init_process_group(RANK, WORLD_SIZE)
+
+#фоновое сохранение чекпоинтов и политика хранения
+ASYNC_CHECKPOINTS = True
+KEEP_BEST_N = 3   #сколько лучших best_model_*.pth оставлять
+KEEP_LAST_M = 2   #сколько последних checkpoint_*.pth оставлять
+
+#быстрая валидация: подмножество metadata_val в большинстве эпох
+FAST_EVAL = True
+FAST_EVAL_SUBSET = 64   #размер подмножества, стратифицированного по длине
+FULL_EVAL_EVERY = 5     #полная валидация каждые K эпох
+
 #конфиг датасета(ruslan formatter)
 dataset_config = BaseDatasetConfig(
     formatter="ruslan",
@@ -33,6 +67,9 @@ dataset_config = BaseDatasetConfig(
 _orig_remove_experiment_folder = trainer_module.remove_experiment_folder
 
 def _safe_remove_experiment_folder(path):
+    #trainer решает, удалять ли папку, по наличию .pth - дожидаемся фоновых записей
+    if checkpoint_saver is not None:
+        checkpoint_saver.wait()
     try:
         _orig_remove_experiment_folder(path)
     except PermissionError as exc:
@@ -40,6 +77,12 @@ def _safe_remove_experiment_folder(path):
 
 trainer_module.remove_experiment_folder = _safe_remove_experiment_folder
 
+#сохранение чекпоинтов без блокировки цикла обучения на запись на диск
+checkpoint_saver = None
+if ASYNC_CHECKPOINTS and RANK == 0:  #чекпоинты сохраняет только ранг 0
+    checkpoint_saver = AsyncCheckpointSaver(keep_best_n=KEEP_BEST_N, keep_last_m=KEEP_LAST_M)
+    checkpoint_saver.install(trainer_module)
+
 
 #конфиг модели GlowTTS
 config = GlowTTSConfig(
@@ -88,7 +131,7 @@ tokenizer, config = TTSTokenizer.init_from_config(config)
 #загружаем семплы (список [text, audio_path, speaker_name])
 train_samples, eval_samples = load_tts_samples(
     dataset_config,
-    eval_split=False,  #мы явно указали meta_file_val
+    eval_split=True,  #без этого load_tts_samples не читает meta_file_val и валидация отключается
 )
 
 def _fix_sample_paths(samples, dataset_root):
@@ -186,12 +229,21 @@ if not eval_samples:
     config.run_eval = False
     print("[warn] eval_samples пусты, отключаю run_eval.")
 
+#DDP: у каждого ранга своя доля train_samples; валидация, логи и чекпоинты - только на ранге 0
+if DISTRIBUTED:
+    train_samples = shard_samples(train_samples, RANK, WORLD_SIZE)
+    config.mixed_precision = False  #на CPU autocast перевел бы обучение в bf16
+    if RANK > 0:
+        config.run_eval = False
+        config.output_path = os.path.join(OUTPUT_PATH, "ddp_ranks")  #не засоряем run-* папки
+    print(f"[ddp] ранг {RANK}/{WORLD_SIZE}: train сэмплов {len(train_samples)}")
+
 #сама модель
 model = GlowTTS(config, ap, tokenizer, speaker_manager=None) #один спикер → speaker_manager=None
 
 #трейнер
 trainer = Trainer(
-    TrainerArgs(),
+    TrainerArgs(rank=RANK),
     config,
     OUTPUT_PATH,
     model=model,
@@ -199,5 +251,29 @@ trainer = Trainer(
     eval_samples=eval_samples,
 )
 
+#замер времени шагов с фоновой записью чекпоинтов и без нее
+if checkpoint_saver is not None:
+    checkpoint_saver.track_steps(trainer)
+
+if DISTRIBUTED:
+    DDPTraining(RANK, WORLD_SIZE, os.path.join(OUTPUT_PATH, "ddp_scaling.json")).install(trainer)
+
+if FAST_EVAL and config.run_eval:
+    FastEval(subset_size=FAST_EVAL_SUBSET, full_every=FULL_EVAL_EVERY).install(trainer)
+
+#трассы и сводка пишутся в <run>/profile, их подхватывает view_tensorboard.py
+profiler = None
+if args.profile and RANK == 0:
+    profiler = TrainingProfiler(start_step=args.profile_start, num_steps=args.profile_steps)
+    profiler.install(trainer)
+
 if __name__ == "__main__":
-    trainer.fit()
+    try:
+        trainer.fit()
+    finally:
+        if profiler is not None:
+            profiler.close()
+        if checkpoint_saver is not None:
+            checkpoint_saver.close()
+        if DISTRIBUTED:
+            torch.distributed.destroy_process_group()
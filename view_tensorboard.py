@@ -1,3 +1,4 @@
+import json
 import sys
 import subprocess
 from pathlib import Path
@@ -114,6 +115,46 @@ def analyze_training_log(exp_path):
         'errors': error_count
     }
 
+def analyze_profiles(exp_path):
+    """Выводит сводки профилирования (profile/profile_*.json), если они есть."""
+    profiles = sorted((exp_path / "profile").glob("profile_*.json"))
+    if not profiles:
+        return None
+    
+    print("\n" + "="*70)
+    print("⏱️  ПРОФИЛИРОВАНИЕ")
+    print("="*70)
+    
+    summaries = {}
+    for path in profiles:
+        with open(path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        name = path.stem[len("profile_"):]
+        summaries[name] = summary
+        print(f"\n📄 {name} ({path.parent / ('summary_' + name + '.txt')})")
+        
+        if summary.get("kind") == "train":
+            phases = summary["phases_s"]
+            total = sum(phases.values())
+            steps = max(1, summary["steps"])
+            if summary["steps"] < summary.get("planned_steps", summary["steps"]):
+                print(f"   ⚠️  частичное окно: {summary['steps']} из {summary['planned_steps']} шагов")
+            for phase, value in phases.items():
+                share = 100 * value / total if total > 0 else 0
+                print(f"   {phase:<10} {1000 * value / steps:>8.1f} мс/шаг  ({share:.1f}%)")
+            if total > 0 and summary["data_wait_s"] / total > 0.3:
+                print("⚠️  Больше 30% времени шага - ожидание DataLoader. Увеличьте num_loader_workers.")
+        else:
+            times = summary.get("call_times_s", [])
+            if times:
+                print(f"   вызовов: {len(times)}, среднее время: {1000 * sum(times) / len(times):.1f} мс")
+        
+        peak = summary.get("peak_mb")
+        if peak is not None:
+            print(f"   пик памяти за окно профилирования ({summary.get('device')}): {peak:.1f} MB")
+    
+    return summaries
+
 def main():
     #определяем путь к эксперименту
     if len(sys.argv) > 1:
@@ -140,6 +181,9 @@ def main():
     #анализируем текстовый лог
     analysis = analyze_training_log(exp_path)
     
+    #сводки профилирования (train_ruslan_glowtts.py --profile, inference.py --profile)
+    analyze_profiles(exp_path)
+    
     #запускаем TensorBoard
     print("\n" + "="*70)
     print("🚀 ЗАПУСК TENSORBOARD")